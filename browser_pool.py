@@ -0,0 +1,173 @@
+import os
+import time
+
+
+class BrowserPool:
+    """
+    管理搜索用的浏览器、上下文和页面
+
+    - 每处理 recycle_after 个查询，或页面 JS 堆内存超过 memory_limit_mb 时，关闭旧上下文并新建一个，
+      避免长时间运行后内存不断增长
+    - 浏览器崩溃或页面失效时自动重启浏览器，并用保存的登录状态恢复；
+      回收或重启时打开首页失败会再次重启，连续 max_restarts 次重启失败才放弃
+    - 登录状态通过 storage_state 保存到 state_path，供上下文回收、崩溃恢复和下次运行复用；
+      只有调用方确认已登录 (logged_in 为 True) 后才会保存，避免未登录或已失效的状态覆盖文件
+    """
+
+    def __init__(self, playwright, home_url, headless=False, state_path=None,
+                 recycle_after=50, memory_limit_mb=512, max_restarts=5, navigation_timeout=60000):
+        self.playwright = playwright
+        self.home_url = home_url
+        self.headless = headless
+        self.state_path = state_path
+        self.recycle_after = recycle_after
+        self.memory_limit_mb = memory_limit_mb
+        self.max_restarts = max_restarts
+        self.navigation_timeout = navigation_timeout
+
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.queries_since_recycle = 0
+        self.restarts = 0
+        self.failed_restarts = 0  # 连续重启失败的次数，查询成功完成后清零
+        self.recycles = 0
+        self.logged_in = False  # 由调用方在确认登录成功后设置
+        self._crashed = False
+
+    def has_state(self):
+        return bool(self.state_path) and os.path.exists(self.state_path)
+
+    def start(self):
+        """启动浏览器并打开页面，有保存的登录状态时直接使用"""
+        self.browser = self.playwright.chromium.launch(headless=self.headless)
+        self._new_context()
+        return self.page
+
+    def _new_context(self):
+        storage_state = self.state_path if self.has_state() else None
+        self.context = self.browser.new_context(storage_state=storage_state)
+        self.page = self.context.new_page()
+        self._crashed = False
+        self.page.on("crash", self._on_crash)
+        self.queries_since_recycle = 0
+
+    def _on_crash(self, *args):
+        print("检测到页面崩溃")
+        self._crashed = True
+
+    def goto_home(self):
+        print(f"正在打开: {self.home_url}")
+        self.page.goto(self.home_url, timeout=self.navigation_timeout)
+        return self.page
+
+    def save_state(self):
+        """保存当前上下文的登录状态，未确认登录时不保存"""
+        if not self.logged_in or not self.state_path or self.context is None:
+            return
+        try:
+            self.context.storage_state(path=self.state_path)
+            print(f"登录状态已保存到 {self.state_path}")
+        except Exception as e:
+            print(f"保存登录状态时发生错误: {str(e)}")
+
+    def is_healthy(self):
+        if self._crashed or self.browser is None or self.page is None:
+            return False
+        try:
+            return self.browser.is_connected() and not self.page.is_closed()
+        except Exception:
+            return False
+
+    def memory_usage_mb(self):
+        """当前页面的 JS 堆内存 (MB)，无法获取时返回 0"""
+        try:
+            used = self.page.evaluate(
+                "() => (performance.memory && performance.memory.usedJSHeapSize) || 0"
+            )
+            return used / (1024 * 1024)
+        except Exception:
+            return 0
+
+    def recycle(self):
+        """关闭当前上下文并用保存的登录状态新建一个，失败时退回到重启浏览器"""
+        self.save_state()
+        try:
+            self.context.close()
+        except Exception as e:
+            print(f"关闭旧上下文时发生错误: {str(e)}")
+        try:
+            self._new_context()
+            self.recycles += 1
+            print(f"已回收浏览器上下文 (第 {self.recycles} 次)")
+            return self.goto_home()
+        except Exception as e:
+            print(f"回收上下文后打开首页失败: {str(e)}")
+            return self.restart()
+
+    def restart(self):
+        """
+        浏览器崩溃后重启，并用保存的登录状态恢复
+
+        重启或打开首页失败时继续重试，连续失败 max_restarts 次后抛出 RuntimeError
+        """
+        while True:
+            if self.failed_restarts >= self.max_restarts:
+                raise RuntimeError(f"浏览器已连续重启 {self.failed_restarts} 次仍不可用，不再尝试")
+            self.failed_restarts += 1
+            self.restarts += 1
+            print(f"浏览器不可用，正在重启 (连续第 {self.failed_restarts}/{self.max_restarts} 次)...")
+            self.close()
+            try:
+                self.start()
+                return self.goto_home()
+            except Exception as e:
+                print(f"重启浏览器失败: {str(e)}")
+
+    def ensure_page(self):
+        """在每次查询前调用，浏览器不可用时先重启，返回可用的页面"""
+        if not self.is_healthy():
+            return self.restart()
+        return self.page
+
+    def after_query(self):
+        """
+        在每次查询后调用，达到查询次数或内存上限时回收上下文
+
+        返回:
+            当前可用的页面
+        """
+        self.queries_since_recycle += 1
+        if not self.is_healthy():
+            return self.restart()
+        # 页面在查询后仍可用，说明之前的重启已经恢复
+        self.failed_restarts = 0
+
+        if self.recycle_after and self.queries_since_recycle >= self.recycle_after:
+            print(f"上下文已处理 {self.queries_since_recycle} 个查询，准备回收...")
+            return self.recycle()
+
+        if self.memory_limit_mb:
+            used_mb = self.memory_usage_mb()
+            if used_mb > self.memory_limit_mb:
+                print(f"页面内存占用 {used_mb:.0f}MB 超过 {self.memory_limit_mb}MB，准备回收...")
+                return self.recycle()
+
+        return self.page
+
+    def wait(self, seconds):
+        """在页面中等待，页面不可用时退回到 time.sleep，避免等待本身抛出异常"""
+        try:
+            self.page.wait_for_timeout(int(seconds * 1000))
+        except Exception:
+            time.sleep(seconds)
+
+    def close(self):
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception as e:
+                print(f"关闭浏览器时发生错误: {str(e)}")
+        self.browser = None
+        self.context = None
+        self.page = None
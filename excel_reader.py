@@ -1,13 +1,73 @@
-import pandas as pd
 import os
 import sys
 
-def read_excel_data(file_path):
+# pandas 和 openpyxl 导入较慢，只在真正读取文件时才导入
+
+def validate_excel_file(file_path, required_columns=('品牌', '商品名称')):
+    """
+    快速检查Excel文件是否可用于搜索，不加载 pandas
+
+    使用 openpyxl 只读模式读取表头并统计有效行数，适合在正式运行前做预检。
+
+    参数:
+        file_path (str): Excel文件的路径
+        required_columns (tuple): 必须包含的列名
+
+    返回:
+        int: 所有必需列都不为空的数据行数；文件不可用时返回 None
+    """
+    if not os.path.exists(file_path):
+        print(f"错误: 文件 '{file_path}' 不存在")
+        return None
+
+    if not file_path.endswith(('.xlsx', '.xls')):
+        print(f"错误: 文件 '{file_path}' 不是Excel文件")
+        return None
+
+    if file_path.endswith('.xls'):
+        # openpyxl 不支持旧版 .xls，退回到完整读取
+        data = read_excel_data(file_path, required_columns)
+        return None if data is None else len(data)
+
+    try:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            # 与 pd.read_excel 的默认行为一致，检查第一个工作表而不是当前活动工作表
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            columns = [str(value) if value is not None else "" for value in header]
+
+            missing_columns = [col for col in required_columns if col not in columns]
+            if missing_columns:
+                print(f"错误: Excel文件缺少以下列: {', '.join(missing_columns)}")
+                print(f"可用的列: {', '.join(col for col in columns if col)}")
+                return None
+
+            indexes = [columns.index(col) for col in required_columns]
+            valid_rows = 0
+            for row in rows:
+                if all(i < len(row) and row[i] not in (None, "") for i in indexes):
+                    valid_rows += 1
+        finally:
+            workbook.close()
+
+        print(f"文件 '{file_path}' 检查通过，共 {valid_rows} 条有效数据")
+        return valid_rows
+
+    except Exception as e:
+        print(f"检查Excel文件时发生错误: {str(e)}")
+        return None
+
+def read_excel_data(file_path, required_columns=('品牌', '商品名称'), optional_columns=()):
     """
     从Excel文件中读取品牌和商品名称两列的内容
     
     参数:
         file_path (str): Excel文件的路径
+        required_columns (tuple): 需要保留的列名
+        optional_columns (tuple): 存在时一并保留的列名，如 '优先级'
     
     返回:
         pandas.DataFrame: 包含品牌和商品名称的数据框
@@ -24,10 +84,11 @@ def read_excel_data(file_path):
             return None
         
         # 读取Excel文件
+        import pandas as pd
         df = pd.read_excel(file_path)
         
         # 检查是否包含必要的列
-        required_columns = ['品牌', '商品名称']
+        required_columns = list(required_columns)
         missing_columns = [col for col in required_columns if col not in df.columns]
         
         if missing_columns:
@@ -35,11 +96,12 @@ def read_excel_data(file_path):
             print(f"可用的列: {', '.join(df.columns)}")
             return None
         
-        # 只保留品牌和商品名称两列
-        result_df = df[['品牌', '商品名称']]
+        # 只保留需要的列（默认为品牌和商品名称两列）
+        kept_columns = required_columns + [col for col in optional_columns if col in df.columns]
+        result_df = df[kept_columns]
         
-        # 删除空值行
-        result_df = result_df.dropna()
+        # 删除必需列为空的行
+        result_df = result_df.dropna(subset=required_columns)
         
         print(f"成功读取 {len(result_df)} 条数据")
         return result_df
@@ -48,26 +110,32 @@ def read_excel_data(file_path):
         print(f"读取Excel文件时发生错误: {str(e)}")
         return None
 
-def main():
-    # 检查命令行参数
-    if len(sys.argv) < 2:
-        print("使用方法: python excel_reader.py <Excel文件路径>")
-        return
-    
-    # 从命令行参数获取文件路径
-    file_path = sys.argv[1]
+def main(file_path=None):
+    if file_path is None:
+        # 检查命令行参数
+        if len(sys.argv) < 2:
+            print("使用方法: python excel_reader.py <Excel文件路径>")
+            return False
+        
+        # 从命令行参数获取文件路径
+        file_path = sys.argv[1]
     
     # 读取数据
     data = read_excel_data(file_path)
     
-    if data is not None:
-        # 打印所有数据
-        print("\n所有品牌和商品名称数据:")
-        pd.set_option('display.max_rows', None)  # 显示所有行
-        pd.set_option('display.max_columns', None)  # 显示所有列
-        pd.set_option('display.width', None)  # 自动调整显示宽度
-        pd.set_option('display.max_colwidth', None)  # 显示完整的列内容
-        print(data)
+    if data is None:
+        return False
+
+    import pandas as pd
+
+    # 打印所有数据
+    print("\n所有品牌和商品名称数据:")
+    pd.set_option('display.max_rows', None)  # 显示所有行
+    pd.set_option('display.max_columns', None)  # 显示所有列
+    pd.set_option('display.width', None)  # 自动调整显示宽度
+    pd.set_option('display.max_colwidth', None)  # 显示完整的列内容
+    print(data)
+    return True
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if main() else 1)
\ No newline at end of file
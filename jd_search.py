@@ -1,58 +1,44 @@
-import pandas as pd
 import os
 import sys
-from playwright.sync_api import sync_playwright
 import re
 import random
 import time
+from excel_reader import read_excel_data
+from browser_pool import BrowserPool
+from records import SearchRecord, export_records, parse_price, parse_sku_id
+from retry_queue import RetryQueue, classify_error, ERROR_EMPTY
+from scheduler import PRIORITY_COLUMN, RefreshScheduler, plan_queries
 
-def read_excel_data(file_path):
+# pandas 和 playwright 导入较慢，在 main() 中真正开始搜索时才导入
+
+HOME_URL = "https://www.jd.com/"
+# "我的京东"页面需要登录，未登录时会被重定向到 passport.jd.com
+ACCOUNT_URL = "https://home.jd.com/"
+# 登录状态文件，用于上下文回收、崩溃恢复和无界面模式
+DEFAULT_STATE_PATH = "jd_state.json"
+# 刷新历史文件，记录每个商品的价格和上次成功时间，用于增量模式
+DEFAULT_HISTORY_PATH = "jd_history.json"
+
+
+def is_logged_in(page):
     """
-    从Excel文件中读取品牌和商品名称两列的内容
-    
+    检查当前上下文是否仍处于登录状态
+
     参数:
-        file_path (str): Excel文件的路径
-    
+        page: Playwright页面实例
+
     返回:
-        pandas.DataFrame: 包含品牌和商品名称的数据框
+        bool: 打开"我的京东"后没有被重定向到登录页时返回 True
     """
     try:
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            print(f"错误: 文件 '{file_path}' 不存在")
-            return None
-        
-        # 检查文件扩展名
-        if not file_path.endswith(('.xlsx', '.xls')):
-            print(f"错误: 文件 '{file_path}' 不是Excel文件")
-            return None
-        
-        # 读取Excel文件
-        df = pd.read_excel(file_path)
-        
-        # 检查是否包含必要的列
-        required_columns = ['品牌', '商品名称']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            print(f"错误: Excel文件缺少以下列: {', '.join(missing_columns)}")
-            print(f"可用的列: {', '.join(df.columns)}")
-            return None
-        
-        # 只保留品牌和商品名称两列
-        result_df = df[['品牌', '商品名称']]
-        
-        # 删除空值行
-        result_df = result_df.dropna()
-        
-        print(f"成功读取 {len(result_df)} 条数据")
-        return result_df
-    
+        page.goto(ACCOUNT_URL, timeout=60000)
     except Exception as e:
-        print(f"读取Excel文件时发生错误: {str(e)}")
-        return None
+        print(f"检查登录状态时发生错误: {str(e)}")
+        return False
+    return "passport.jd.com" not in page.url
+
 
-def search_jd_with_product(product_name, brand_name, browser, page, results):
+def search_jd_with_product(product_name, brand_name, browser, page, results, retry_queue=None, headless=False):
     """
     使用Playwright搜索指定商品名称，并从结果页面中提取包含"旗舰"的店铺名称、价格和链接
     
@@ -61,7 +47,10 @@ def search_jd_with_product(product_name, brand_name, browser, page, results):
         brand_name (str): 商品品牌
         browser: Playwright浏览器实例
         page: Playwright页面实例
-        results: 存储结果的列表
+        results: 存储结果的列表，元素为 SearchRecord
+        retry_queue (RetryQueue): 可选，失败或无结果的查询会加入该队列稍后重试，
+            只有达到重试上限后才记录失败结果
+        headless (bool): 是否为无界面模式，此时无法手动完成风险验证，遇到验证页面直接按失败处理
     
     返回:
         bool: 搜索是否成功
@@ -98,6 +87,9 @@ def search_jd_with_product(product_name, brand_name, browser, page, results):
         
         # 检查是否跳转到风险验证页面
         if "cfe.m.jd.com/privatedomain/risk_handler" in current_url:
+            if headless:
+                # 无界面模式下没有人能完成验证，直接失败，由重试队列按风险验证的间隔稍后重试
+                raise RuntimeError(f"检测到风险验证页面: {current_url}")
             print("检测到风险验证页面，请完成验证...")
             # 等待用户完成验证，验证完成后会跳转到搜索结果页面
             # 等待URL变化，不再是风险验证页面
@@ -210,29 +202,26 @@ def search_jd_with_product(product_name, brand_name, browser, page, results):
 
 
                 # 将找到的旗舰店信息添加到结果列表
-                result_item = {
-                    "品牌": brand_name,
-                    "商品名称": product_name, # 这是Excel输入的原始商品名
-                    "旗舰店铺": shop_name,
-                    "价格值": price_value,
-                    "显示价格": price_text,
-                    "商品链接": product_link,
-                    "提取的商品标题": extracted_title # !! 新增：添加提取的标题
-                }
+                result_item = SearchRecord(
+                    query=product_name, # 这是Excel输入的原始商品名
+                    brand=brand_name,
+                    title=extracted_title, # !! 新增：添加提取的标题
+                    shop=shop_name,
+                    price=parse_price(price_value or price_text),
+                    sku_id=parse_sku_id(product_link),
+                    url=product_link
+                )
                 results.append(result_item)
                 print("-" * 30) # 分隔每个找到的旗舰店信息
 
         if not found_flagship:
             print(f"商品: {product_name} 未找到符合条件的旗舰店铺")
+            if retry_queue is not None:
+                retry_queue.push((brand_name, product_name), ERROR_EMPTY, "未找到旗舰店铺", payload=brand_name)
             # 可以选择是否为未找到旗舰店的商品添加一条空记录
-            # results.append({
-            #     "品牌": brand_name,
-            #     "商品名称": product_name,
-            #     "旗舰店铺": "未找到",
-            #     "价格值": "",
-            #     "显示价格": "",
-            #     "商品链接": ""
-            # })
+            # results.append(SearchRecord(query=product_name, brand=brand_name, shop="未找到"))
+        elif retry_queue is not None:
+            retry_queue.mark_success((brand_name, product_name))
 
         # --- 修改结束 ---
 
@@ -240,67 +229,140 @@ def search_jd_with_product(product_name, brand_name, browser, page, results):
         
     except Exception as e:
         print(f"搜索商品 '{product_name}' 时发生错误: {str(e)}") # 在错误信息中包含商品名
-        # 即使发生错误，也添加一条记录
-        results.append({
-            "品牌": brand_name,
-            "商品名称": product_name,
-            "旗舰店铺": "搜索失败",
-            "价格值": "",
-            "显示价格": "",
-            "商品链接": f"错误: {str(e)}",
-            "提取的商品标题": "" # !! 新增：错误时也添加空标题列
-        })
+        if retry_queue is not None:
+            kind = classify_error(e, page.url)
+            # 同名商品可能属于不同品牌，按 (品牌, 商品名称) 区分
+            if retry_queue.push((brand_name, product_name), kind, str(e), payload=brand_name):
+                return False
+        # 不再重试时添加一条失败记录
+        results.append(SearchRecord(query=product_name, brand=brand_name, error=str(e)))
         return False
 
-def main():
-    # 检查命令行参数
-    if len(sys.argv) < 2:
-        print("使用方法: python jd_search.py <Excel文件路径>")
-        return
-    
-    # 从命令行参数获取文件路径
-    file_path = sys.argv[1]
+def main(file_path=None, headless=False, state_path=DEFAULT_STATE_PATH,
+         recycle_after=50, memory_limit_mb=512, history_path=DEFAULT_HISTORY_PATH,
+         incremental=False, max_queries=None, time_budget=None):
+    """
+    参数:
+        file_path (str): Excel文件路径，为空时从命令行参数读取
+        headless (bool): 是否以无界面模式运行，需要已保存且仍有效的登录状态
+        state_path (str): 登录状态文件路径
+        recycle_after (int): 每处理多少个查询回收一次浏览器上下文
+        memory_limit_mb (int): 页面内存超过该值时回收浏览器上下文
+        history_path (str): 刷新历史文件路径
+        incremental (bool): 是否只搜索按价格波动、上次成功时间和优先级判断已到期的商品
+        max_queries (int): 本次最多搜索多少个商品
+        time_budget (float): 本次运行的时间预算 (秒)，到时停止搜索新商品
+
+    返回:
+        bool: 是否成功完成，读取文件失败、无法登录或主流程出错时返回 False
+    """
+    if file_path is None:
+        # 检查命令行参数
+        if len(sys.argv) < 2:
+            print("使用方法: python jd_search.py <Excel文件路径>")
+            return False
+        
+        # 从命令行参数获取文件路径
+        file_path = sys.argv[1]
     
     # 读取数据
-    data = read_excel_data(file_path)
+    data = read_excel_data(file_path, optional_columns=(PRIORITY_COLUMN,))
     
     if data is None or data.empty:
         print("无法从Excel文件中获取商品数据")
-        return
+        return False
+
+    # 决定本次要搜索的商品，增量模式下只搜索到期的商品
+    scheduler = RefreshScheduler(history_path)
+    data = plan_queries(data, scheduler, ('品牌', '商品名称'), incremental=incremental, max_queries=max_queries)
+    if data.empty:
+        print("没有需要刷新的商品")
+        return True
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+
+    if headless and not (state_path and os.path.exists(state_path)):
+        print(f"错误: 无界面模式无法手动登录，请先以有界面模式运行一次以保存登录状态到 '{state_path}'")
+        return False
+
+    from playwright.sync_api import sync_playwright
     
     print(f"准备搜索 {len(data)} 个商品")
     
     # 存储所有搜索结果
     all_results = []
+    # 失败或无结果的查询先进入重试队列，在空闲时或全部搜索完成后再试
+    retry_queue = RetryQueue(max_attempts=3)
+
+    def flush_pending():
+        # 仍在重试队列中的查询按失败记录保存，没有旗舰店的查询与原来一样不记录
+        for entry in retry_queue.pop_all():
+            if entry.kind != ERROR_EMPTY:
+                brand_name, product_name = entry.key
+                all_results.append(SearchRecord(query=product_name, brand=brand_name, error=entry.message))
     
+    succeeded = False
     with sync_playwright() as p:
-        # 启动浏览器
-        browser = p.chromium.launch(headless=False)  # headless=False 可以看到浏览器界面
+        # 启动浏览器，上下文定期回收，崩溃后自动重启并恢复登录状态
+        pool = BrowserPool(p, HOME_URL, headless=headless, state_path=state_path,
+                           recycle_after=recycle_after, memory_limit_mb=memory_limit_mb)
         
         try:
-            # 创建新页面
-            page = browser.new_page()
-            
-            # 先访问京东登录页面
-            login_url = "https://passport.jd.com/new/login.aspx?ReturnUrl=https%3A%2F%2Fwww.jd.com%2F"
-            print(f"正在访问京东登录页面: {login_url}")
-            page.goto(login_url)
-            
-            # 等待用户手动登录
-            print("请在浏览器中完成登录操作...")
+            page = pool.start()
             
-            # 等待登录完成，检测是否跳转到京东首页
-            page.wait_for_url("https://www.jd.com/**", timeout=300000)  # 设置5分钟超时，等待用户登录
-            print("登录成功，已跳转到京东首页")
+            if pool.has_state():
+                print(f"使用已保存的登录状态: {state_path}")
+                pool.logged_in = is_logged_in(page)
+                if not pool.logged_in:
+                    print("已保存的登录状态已失效")
+
+            if pool.logged_in:
+                pool.goto_home()
+            elif headless:
+                print(f"错误: 无界面模式无法手动登录，请先以有界面模式运行一次以更新 '{state_path}' 中的登录状态")
+                return False
+            else:
+                # 先访问京东登录页面
+                login_url = "https://passport.jd.com/new/login.aspx?ReturnUrl=https%3A%2F%2Fwww.jd.com%2F"
+                print(f"正在访问京东登录页面: {login_url}")
+                page.goto(login_url)
+                
+                # 等待用户手动登录
+                print("请在浏览器中完成登录操作...")
+                
+                # 等待登录完成，检测是否跳转到京东首页
+                page.wait_for_url("https://www.jd.com/**", timeout=300000)  # 设置5分钟超时，等待用户登录
+                print("登录成功，已跳转到京东首页")
+                pool.logged_in = True
+                pool.save_state()
+
+            def search(product_name, brand_name):
+                page = pool.ensure_page()
+                start = len(all_results)
+                success = search_jd_with_product(product_name, brand_name, pool.browser, page, all_results, retry_queue,
+                                                 headless=headless)
+                # 记录本次搜索到的价格，供下次运行计算刷新间隔
+                scheduler.record((brand_name, product_name), [record.price for record in all_results[start:] if record.ok])
+                pool.after_query()
+                return success
+
+            def retry_entry(entry):
+                brand_name, product_name = entry.key
+                print(f"\n----- 重试已失败 {entry.attempts} 次的商品: {brand_name} {product_name} ({entry.kind}) -----")
+                search(product_name, brand_name)
+                pool.wait(random.uniform(5, 10))
             
             # 遍历所有商品进行搜索
             for index, row in data.iterrows():
+                if deadline is not None and time.monotonic() >= deadline:
+                    print(f"\n已到时间预算，剩余 {len(data) - index} 个商品留到下次运行")
+                    break
+
                 product_name = row['商品名称']
                 brand_name = row['品牌']
                 print(f"\n===== 正在处理第 {index+1}/{len(data)} 个商品 =====")
                 
                 # 搜索商品
-                success = search_jd_with_product(product_name, brand_name, browser, page, all_results)
+                success = search(product_name, brand_name)
                 
                 if not success:
                     print(f"搜索商品 '{product_name}' 失败，已记录")
@@ -309,39 +371,58 @@ def main():
                 if index < len(data) - 1:  # 如果不是最后一个商品
                     wait_time = random.uniform(5, 10)
                     print(f"\n请查看当前商品的搜索结果，{wait_time:.1f}秒后将继续搜索下一个商品...")
-                    page.wait_for_timeout(int(wait_time * 1000))  # 转换为毫秒
+                    pool.wait(wait_time)
+
+                    # 利用间隙重试一条已到期的失败查询
+                    entry = retry_queue.pop_ready()
+                    if entry is not None:
+                        retry_entry(entry)
+
+            # 处理重试队列中剩余的查询
+            retry_queue.drain(retry_entry, sleep=pool.wait, until=deadline)
+            flush_pending()
+            print(f"\n重试成功 {retry_queue.recovered} 个商品，最终失败统计: {retry_queue.summary() or '无'}")
+            print(f"浏览器上下文回收 {pool.recycles} 次，崩溃重启 {pool.restarts} 次")
             
             # 所有商品搜索完成，保存结果到Excel
             result_file = "result.xlsx"
             print(f"\n所有商品搜索完成，正在保存结果到 {result_file}...")
             
-            # 创建DataFrame并保存
-            result_df = pd.DataFrame(all_results)
-            result_df.to_excel(result_file, index=False)
+            # 按原有列布局保存
+            export_records(all_results, result_file, "jd")
             
             print(f"结果已保存到 {result_file}")
-            print("按Ctrl+C终止程序...")
-            
-            # 等待用户手动终止程序
-            page.wait_for_timeout(60000)  # 等待1分钟
+            pool.save_state()
+
+            if not headless:
+                print("按Ctrl+C终止程序...")
+                
+                # 等待用户手动终止程序
+                pool.wait(60)  # 等待1分钟
+
+            succeeded = True
             
         except Exception as e:
             print(f"发生错误: {str(e)}")
+
+            flush_pending()
             
             # 如果已经有搜索结果，尝试保存
             if all_results:
                 try:
                     result_file = "result.xlsx"
                     print(f"尝试保存已有结果到 {result_file}...")
-                    result_df = pd.DataFrame(all_results)
-                    result_df.to_excel(result_file, index=False)
+                    export_records(all_results, result_file, "jd")
                     print(f"结果已保存到 {result_file}")
                 except Exception as save_error:
                     print(f"保存结果时发生错误: {str(save_error)}")
         finally:
             # 关闭浏览器
-            browser.close()
+            pool.close()
             print("浏览器已关闭")
 
+    return succeeded
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if main() else 1)
\ No newline at end of file
@@ -1,6 +1,218 @@
-def main():
-    print("Hello from jdfinder!")
+import argparse
+import os
+import sys
+import time
+
+# 这里只导入标准库，pandas、openpyxl、playwright 以及各搜索脚本都在子命令中按需导入，
+# 这样参数错误和 --validate 预检都能在一秒内返回
+
+JD_COLUMNS = ('品牌', '商品名称')
+MANMANBUY_COLUMNS = ('商品名称',)
+
+
+def positive_int(value):
+    """argparse 类型: 正整数"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' 不是整数")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"必须大于 0: {value}")
+    return number
+
+
+def positive_float(value):
+    """argparse 类型: 正数"""
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' 不是数字")
+    if not number > 0:  # 同时排除 NaN
+        raise argparse.ArgumentTypeError(f"必须大于 0: {value}")
+    return number
+
+
+def validate_workbook(file_path, required_columns):
+    """预检输入的Excel文件，返回进程退出码"""
+    from excel_reader import validate_excel_file
+
+    start = time.perf_counter()
+    valid_rows = validate_excel_file(file_path, required_columns)
+    elapsed = time.perf_counter() - start
+    print(f"检查耗时 {elapsed * 1000:.0f} 毫秒")
+
+    if not valid_rows:
+        if valid_rows == 0:
+            print("错误: 文件中没有可用于搜索的数据")
+        return 1
+    return 0
+
+
+def cmd_jd(args):
+    if args.validate:
+        return validate_workbook(args.file, JD_COLUMNS)
+
+    import jd_search
+    succeeded = jd_search.main(args.file, headless=args.headless,
+                               state_path=args.state or jd_search.DEFAULT_STATE_PATH,
+                               recycle_after=args.recycle_after, memory_limit_mb=args.memory_limit,
+                               history_path=args.history or jd_search.DEFAULT_HISTORY_PATH,
+                               incremental=args.incremental, max_queries=args.max_queries,
+                               time_budget=args.time_budget * 60 if args.time_budget is not None else None)
+    return 0 if succeeded else 1
+
+
+def cmd_manmanbuy(args):
+    if args.validate:
+        return validate_workbook(args.file, MANMANBUY_COLUMNS)
+
+    import manmanbuy_search
+    succeeded = manmanbuy_search.main(args.file, headless=args.headless,
+                                      state_path=args.state or manmanbuy_search.DEFAULT_STATE_PATH,
+                                      recycle_after=args.recycle_after, memory_limit_mb=args.memory_limit,
+                                      history_path=args.history or manmanbuy_search.DEFAULT_HISTORY_PATH,
+                                      incremental=args.incremental, max_queries=args.max_queries,
+                                      time_budget=args.time_budget * 60 if args.time_budget is not None else None)
+    return 0 if succeeded else 1
+
+
+def cmd_read(args):
+    if args.validate:
+        return validate_workbook(args.file, JD_COLUMNS)
+
+    import excel_reader
+    return 0 if excel_reader.main(args.file) else 1
+
+
+def cmd_export(args):
+    """把结果Excel文件导出为 CSV 或 JSON"""
+    if not os.path.exists(args.file):
+        print(f"错误: 文件 '{args.file}' 不存在")
+        return 1
+
+    output = args.output
+    if output is None:
+        output = os.path.splitext(args.file)[0] + "." + args.format
+    output_format = args.format
+    if output.endswith(".json"):
+        output_format = "json"
+    elif output.endswith(".csv"):
+        output_format = "csv"
+
+    import pandas as pd
+
+    try:
+        df = pd.read_excel(args.file)
+        if output_format == "json":
+            df.to_json(output, orient="records", force_ascii=False, indent=2)
+        else:
+            # 使用 utf-8-sig 编码，Excel 打开 CSV 时中文不会乱码
+            df.to_csv(output, index=False, encoding="utf-8-sig")
+    except Exception as e:
+        print(f"导出结果时发生错误: {str(e)}")
+        return 1
+
+    print(f"已将 {len(df)} 条结果导出到 {output}")
+    return 0
+
+
+def cmd_bench(args):
+    """测量启动和读取输入文件的耗时"""
+    from excel_reader import read_excel_data, validate_excel_file
+
+    def timed(func):
+        start = time.perf_counter()
+        result = func()
+        return time.perf_counter() - start, result
+
+    import_times = {}
+    for module in ("openpyxl", "pandas", "playwright.sync_api"):
+        import_times[module], _ = timed(lambda: __import__(module))
+
+    columns = MANMANBUY_COLUMNS if args.layout == "manmanbuy" else JD_COLUMNS
+    validate_times = []
+    read_times = []
+    for _ in range(args.repeat):
+        elapsed, valid_rows = timed(lambda: validate_excel_file(args.file, columns))
+        if valid_rows is None:
+            return 1
+        validate_times.append(elapsed)
+        elapsed, _ = timed(lambda: read_excel_data(args.file, required_columns=columns))
+        read_times.append(elapsed)
+
+    print("\n===== 基准测试结果 =====")
+    for module, elapsed in import_times.items():
+        print(f"导入 {module}: {elapsed * 1000:.0f} 毫秒")
+    print(f"--validate 预检 ({args.repeat} 次): 最快 {min(validate_times) * 1000:.1f} 毫秒, "
+          f"平均 {sum(validate_times) / len(validate_times) * 1000:.1f} 毫秒")
+    print(f"pandas 读取 ({args.repeat} 次): 最快 {min(read_times) * 1000:.1f} 毫秒, "
+          f"平均 {sum(read_times) / len(read_times) * 1000:.1f} 毫秒")
+    return 0
+
+
+def add_schedule_arguments(parser, default_history):
+    parser.add_argument("--incremental", action="store_true",
+                        help="只搜索按价格波动、上次成功时间和'优先级'列判断已到期的商品")
+    parser.add_argument("--history", help=f"刷新历史文件路径 (默认: {default_history})")
+    parser.add_argument("--max-queries", type=positive_int, help="本次最多搜索多少个商品")
+    parser.add_argument("--time-budget", type=positive_float, help="本次运行的时间预算 (分钟)，到时停止搜索新商品")
+
+
+def add_browser_arguments(parser, default_state):
+    parser.add_argument("--headless", action="store_true",
+                        help="以无界面模式运行，需要先以有界面模式登录一次保存登录状态")
+    parser.add_argument("--state", help=f"登录状态文件路径 (默认: {default_state})")
+    parser.add_argument("--recycle-after", type=int, default=50,
+                        help="每处理多少个查询回收一次浏览器上下文，0 表示不按次数回收 (默认: 50)")
+    parser.add_argument("--memory-limit", type=int, default=512,
+                        help="页面内存超过多少MB时回收浏览器上下文，0 表示不检查 (默认: 512)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="jdfinder", description="京东旗舰店及慢慢买比价搜索工具")
+    subparsers = parser.add_subparsers(dest="command", metavar="<命令>")
+    subparsers.required = True
+
+    jd_parser = subparsers.add_parser("jd", help="在京东搜索旗舰店商品")
+    jd_parser.add_argument("file", help="包含'品牌'和'商品名称'列的Excel文件")
+    jd_parser.add_argument("--validate", action="store_true", help="只检查输入文件，不启动浏览器")
+    add_browser_arguments(jd_parser, "jd_state.json")
+    add_schedule_arguments(jd_parser, "jd_history.json")
+    jd_parser.set_defaults(func=cmd_jd)
+
+    manmanbuy_parser = subparsers.add_parser("manmanbuy", help="在慢慢买搜索商品比价")
+    manmanbuy_parser.add_argument("file", help="包含'商品名称'列的Excel文件")
+    manmanbuy_parser.add_argument("--validate", action="store_true", help="只检查输入文件，不启动浏览器")
+    add_browser_arguments(manmanbuy_parser, "manmanbuy_state.json")
+    add_schedule_arguments(manmanbuy_parser, "manmanbuy_history.json")
+    manmanbuy_parser.set_defaults(func=cmd_manmanbuy)
+
+    read_parser = subparsers.add_parser("read", help="打印Excel文件中的品牌和商品名称")
+    read_parser.add_argument("file", help="Excel文件路径")
+    read_parser.add_argument("--validate", action="store_true", help="只检查文件，不打印数据")
+    read_parser.set_defaults(func=cmd_read)
+
+    export_parser = subparsers.add_parser("export", help="把结果Excel文件导出为 CSV 或 JSON")
+    export_parser.add_argument("file", help="结果Excel文件路径")
+    export_parser.add_argument("-o", "--output", help="输出文件路径，默认与输入文件同名")
+    export_parser.add_argument("--format", choices=("csv", "json"), default="csv",
+                               help="输出格式，输出路径带扩展名时以扩展名为准 (默认: csv)")
+    export_parser.set_defaults(func=cmd_export)
+
+    bench_parser = subparsers.add_parser("bench", help="测量依赖导入和读取输入文件的耗时")
+    bench_parser.add_argument("file", help="输入Excel文件")
+    bench_parser.add_argument("--layout", choices=("jd", "manmanbuy"), default="jd",
+                              help="输入文件的列布局，jd 需要'品牌'和'商品名称'列，manmanbuy 只需要'商品名称'列 (默认: jd)")
+    bench_parser.add_argument("-n", "--repeat", type=positive_int, default=5, help="重复次数 (默认: 5)")
+    bench_parser.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
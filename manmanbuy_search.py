@@ -1,18 +1,29 @@
-import pandas as pd
 import os
 import sys
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import random
 import time
 import re # <-- 新增：导入 re 模块
 from urllib.parse import unquote # <-- 新增：用于解码 URL
+from browser_pool import BrowserPool
+from records import SearchRecord, export_records, parse_price, parse_sku_id
+from retry_queue import RetryQueue, classify_error, ERROR_EMPTY, ERROR_TIMEOUT
+from scheduler import PRIORITY_COLUMN, RefreshScheduler, plan_queries
 
-def read_excel_data_manmanbuy(file_path):
+# pandas 和 playwright 导入较慢，在真正读取文件或搜索时才导入
+
+HOME_URL = "http://www.manmanbuy.com/"
+# 登录状态文件，用于上下文回收、崩溃恢复和无界面模式
+DEFAULT_STATE_PATH = "manmanbuy_state.json"
+# 刷新历史文件，记录每个商品的价格和上次成功时间，用于增量模式
+DEFAULT_HISTORY_PATH = "manmanbuy_history.json"
+
+def read_excel_data_manmanbuy(file_path, optional_columns=()):
     """
     从Excel文件中读取商品名称列的内容
     
     参数:
         file_path (str): Excel文件的路径
+        optional_columns (tuple): 存在时一并保留的列名，如 '优先级'
     
     返回:
         pandas.DataFrame: 包含商品名称的数据框，列名为 '商品名称'
@@ -29,6 +40,7 @@ def read_excel_data_manmanbuy(file_path):
             return None
         
         # 读取Excel文件
+        import pandas as pd
         df = pd.read_excel(file_path)
         
         # 检查是否包含 '商品名称' 列
@@ -38,11 +50,11 @@ def read_excel_data_manmanbuy(file_path):
             print(f"可用的列: {', '.join(df.columns)}")
             return None
         
-        # 只保留商品名称列
-        result_df = df[[required_column]]
+        # 只保留商品名称列及存在的可选列
+        result_df = df[[required_column] + [col for col in optional_columns if col in df.columns]]
         
-        # 删除空值行
-        result_df = result_df.dropna()
+        # 删除商品名称为空的行
+        result_df = result_df.dropna(subset=[required_column])
         
         print(f"成功读取 {len(result_df)} 条商品名称数据")
         return result_df
@@ -52,19 +64,23 @@ def read_excel_data_manmanbuy(file_path):
         return None
 
 
-# !! 修改：函数现在返回提取到的数据列表 !!
-def search_manmanbuy_product(product_name, page):
+# !! 修改：函数现在返回提取到的 SearchRecord 列表 !!
+def search_manmanbuy_product(product_name, page, retry_queue=None):
     """
     在慢慢买网站上搜索指定的商品名称, 并提取结果中的商品名、链接、价格、平台和店铺
     
     参数:
         product_name (str): 要搜索的商品名称
         page: Playwright页面实例
+        retry_queue (RetryQueue): 可选，超时、出错或无结果的查询会加入该队列稍后重试
     
     返回:
-        list: 包含提取到的商品信息的字典列表
+        list: 包含提取到的商品信息的 SearchRecord 列表
     """
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
     extracted_items = []
+    load_timed_out = False
     try:
         print(f"\n正在搜索商品: {product_name}")
         
@@ -86,6 +102,7 @@ def search_manmanbuy_product(product_name, page):
             print("短暂延时 (2秒) 确保内容渲染...")
             page.wait_for_timeout(2000)
         except PlaywrightTimeoutError:
+            load_timed_out = True
             print("警告: 等待 networkidle 超时，可能仍在加载或已加载完成。继续尝试查找结果...")
 
         # 查找所有商品div
@@ -139,138 +156,212 @@ def search_manmanbuy_product(product_name, page):
                     print(f"  提取到: 名称='{extracted_name}', 价格='{extracted_price}', "
                           f"平台='{extracted_platform}', 店铺='{extracted_shop}', 链接='{extracted_url}'")
                     
-                    extracted_items.append({
-                        "name": extracted_name,
-                        "price": extracted_price,
-                        "platform": extracted_platform,
-                        "shop": extracted_shop,
-                        "url": extracted_url
-                    })
+                    extracted_items.append(SearchRecord(
+                        query=product_name,
+                        title=extracted_name,
+                        shop=extracted_shop,
+                        platform=extracted_platform,
+                        price=parse_price(extracted_price),
+                        sku_id=parse_sku_id(extracted_url),
+                        url=extracted_url
+                    ))
                 
             except Exception as item_error:
                 print(f"  处理商品项时出错: {item_error}")
                 continue
 
         print(f"商品 '{product_name}' 搜索完成，共提取到 {len(extracted_items)} 条有效结果。")
+        if retry_queue is not None:
+            if extracted_items:
+                retry_queue.mark_success(product_name)
+            elif load_timed_out:
+                # 加载超时导致的空结果按超时处理，而不是当作确实没有结果
+                retry_queue.push(product_name, ERROR_TIMEOUT, "等待 networkidle 超时且未找到结果")
+            else:
+                retry_queue.push(product_name, ERROR_EMPTY, "未找到匹配结果")
         return extracted_items
 
     except PlaywrightTimeoutError as te:
         print(f"错误: 搜索商品 '{product_name}' 时发生超时: {te}")
+        if retry_queue is not None and not extracted_items:
+            retry_queue.push(product_name, classify_error(te, page.url), str(te))
         return extracted_items
     except Exception as e:
         print(f"搜索商品 '{product_name}' 时发生错误: {str(e)}")
+        if retry_queue is not None and not extracted_items:
+            retry_queue.push(product_name, classify_error(e, page.url), str(e))
         return extracted_items
 
 
-def main():
-    # 检查命令行参数
-    if len(sys.argv) < 2:
-        print("使用方法: python manmanbuy_search.py <Excel文件路径>")
-        return
-    
-    file_path = sys.argv[1]
-    data = read_excel_data_manmanbuy(file_path)
+def main(file_path=None, headless=False, state_path=DEFAULT_STATE_PATH,
+         recycle_after=50, memory_limit_mb=512, history_path=DEFAULT_HISTORY_PATH,
+         incremental=False, max_queries=None, time_budget=None):
+    """
+    参数:
+        file_path (str): Excel文件路径，为空时从命令行参数读取
+        headless (bool): 是否以无界面模式运行，没有有效的登录状态时以未登录状态搜索
+        state_path (str): 登录状态文件路径
+        recycle_after (int): 每处理多少个查询回收一次浏览器上下文
+        memory_limit_mb (int): 页面内存超过该值时回收浏览器上下文
+        history_path (str): 刷新历史文件路径
+        incremental (bool): 是否只搜索按价格波动、上次成功时间和优先级判断已到期的商品
+        max_queries (int): 本次最多搜索多少个商品
+        time_budget (float): 本次运行的时间预算 (秒)，到时停止搜索新商品
+
+    返回:
+        bool: 是否成功完成，读取文件失败或主流程出错时返回 False
+    """
+    if file_path is None:
+        # 检查命令行参数
+        if len(sys.argv) < 2:
+            print("使用方法: python manmanbuy_search.py <Excel文件路径>")
+            return False
+        
+        file_path = sys.argv[1]
+    data = read_excel_data_manmanbuy(file_path, optional_columns=(PRIORITY_COLUMN,))
     
     if data is None or data.empty:
         print("无法从Excel文件中获取商品数据")
-        return
+        return False
+
+    # 决定本次要搜索的商品，增量模式下只搜索到期的商品
+    scheduler = RefreshScheduler(history_path)
+    data = plan_queries(data, scheduler, '商品名称', incremental=incremental, max_queries=max_queries)
+    if data.empty:
+        print("没有需要刷新的商品")
+        return True
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+
+    from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
     
     print(f"准备搜索 {len(data)} 个商品")
 
     all_results = [] 
+    # 超时、出错或无结果的查询先进入重试队列，在空闲时或全部搜索完成后再试
+    retry_queue = RetryQueue(max_attempts=3)
+
+    def record_results(product_name, extracted_data):
+        if extracted_data:
+            all_results.extend(extracted_data)
+        elif not retry_queue.is_pending(product_name):
+            # 仍在重试队列中的查询暂不记录，等重试结束后再决定
+            all_results.append(SearchRecord(query=product_name, error="未找到匹配结果"))
+
+    def flush_pending():
+        # 仍在重试队列中的查询按未找到结果记录
+        for entry in retry_queue.pop_all():
+            all_results.append(SearchRecord(query=entry.key, error=entry.message))
+
+    def dedupe(records):
+        # 组合键包含商品名、价格、平台、店铺和链接，未找到结果的记录全部保留
+        unique_records = []
+        seen_combinations = set() # 用于存储已经见过的组合
+        for record in records:
+            if record.ok:
+                combination_key = record.dedupe_key()
+                if combination_key in seen_combinations:
+                    continue
+                seen_combinations.add(combination_key)
+            unique_records.append(record)
+        return unique_records
+
+    def retry_entry(entry):
+        print(f"\n----- 重试已失败 {entry.attempts} 次的商品: {entry.key} ({entry.kind}) -----")
+        search(entry.key)
+        pool.wait(random.uniform(3, 7))
+
+    def search(product_name):
+        page = pool.ensure_page()
+        extracted_data = search_manmanbuy_product(product_name, page, retry_queue)
+        record_results(product_name, extracted_data)
+        # 记录本次搜索到的价格，供下次运行计算刷新间隔
+        scheduler.record(product_name, [record.price for record in extracted_data])
+        pool.after_query()
 
+    succeeded = False
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False) 
-        page = browser.new_page()
+        # 启动浏览器，上下文定期回收，崩溃后自动重启并恢复登录状态
+        pool = BrowserPool(p, HOME_URL, headless=headless, state_path=state_path,
+                           recycle_after=recycle_after, memory_limit_mb=memory_limit_mb)
         
         try:
+            page = pool.start()
+
             # 访问慢慢买首页
-            home_url = "http://www.manmanbuy.com/"
-            print(f"正在访问慢慢买首页: {home_url}")
-            page.goto(home_url, wait_until="networkidle") 
+            print(f"正在访问慢慢买首页: {HOME_URL}")
+            page.goto(HOME_URL, wait_until="networkidle") 
 
             login_button_selector = "a.pt[onclick*='loginShow']" 
-            try:
-                print(f"查找并点击登录按钮: {login_button_selector}")
-                page.wait_for_selector(login_button_selector, timeout=15000)
-                page.click(login_button_selector)
-                print("登录按钮已点击，请在浏览器中完成登录操作...")
-                
-                print("等待登录完成（检测 body style.overflow 变为 'auto'）...")
-                try:
-                    page.wait_for_function(
-                        """() => document.body.style.overflow === 'auto'""",
-                        timeout=300000  
-                    )
-                    print("检测到登录完成（body style.overflow 已变为 'auto'）！")
-                except PlaywrightTimeoutError:
-                    print("等待登录超时（5分钟），将继续执行...")
-                except Exception as wait_error:
-                     print(f"等待登录状态变化时发生错误: {wait_error}")
-                     print("将继续执行...")
+            if pool.has_state():
+                print(f"使用已保存的登录状态: {state_path}")
+                # 页面上仍显示登录按钮说明保存的登录状态已失效
+                pool.logged_in = not page.is_visible(login_button_selector)
+                if not pool.logged_in:
+                    print("已保存的登录状态已失效")
 
-            except PlaywrightTimeoutError:
-                 print("错误：未能找到登录按钮，请检查页面结构或选择器。")
+            if pool.logged_in:
+                print("已登录")
+            elif headless:
+                # 未登录也可以搜索，但不保存登录状态，避免覆盖已有的状态文件
+                print("无界面模式下无法手动登录，将以未登录状态继续执行...")
+            else:
+                try:
+                    print(f"查找并点击登录按钮: {login_button_selector}")
+                    page.wait_for_selector(login_button_selector, timeout=15000)
+                    page.click(login_button_selector)
+                    print("登录按钮已点击，请在浏览器中完成登录操作...")
+                
+                    print("等待登录完成（检测 body style.overflow 变为 'auto'）...")
+                    try:
+                        page.wait_for_function(
+                            """() => document.body.style.overflow === 'auto'""",
+                            timeout=300000  
+                        )
+                        print("检测到登录完成（body style.overflow 已变为 'auto'）！")
+                        pool.logged_in = True
+                        pool.save_state()
+                    except PlaywrightTimeoutError:
+                        print("等待登录超时（5分钟），将以未登录状态继续执行...")
+                    except Exception as wait_error:
+                         print(f"等待登录状态变化时发生错误: {wait_error}")
+                         print("将以未登录状态继续执行...")
 
+                except PlaywrightTimeoutError:
+                     print("错误：未能找到登录按钮，请检查页面结构或选择器。")
 
             # 遍历所有商品进行搜索
             for index, row in data.iterrows():
+                if deadline is not None and time.monotonic() >= deadline:
+                    print(f"\n已到时间预算，剩余 {len(data) - index} 个商品留到下次运行")
+                    break
+
                 product_name = row['商品名称']
                 print(f"\n===== 正在处理第 {index+1}/{len(data)} 个商品: {product_name} =====")
                 
-                extracted_data = search_manmanbuy_product(product_name, page)
-                
-                if extracted_data:
-                    for item in extracted_data:
-                        # !! 修改：添加平台和店铺到结果字典 !!
-                        all_results.append({
-                            "搜索词": product_name,
-                            "提取的商品名": item["name"],
-                            "价格": item["price"], 
-                            "平台": item["platform"], # <-- 新增
-                            "店铺": item["shop"],     # <-- 新增
-                            "商品链接": item["url"]
-                        })
-                else:
-                    # !! 修改：未找到结果时也添加平台和店铺列 !!
-                    all_results.append({
-                        "搜索词": product_name,
-                        "提取的商品名": "未找到匹配结果",
-                        "价格": "", 
-                        "平台": "", # <-- 新增
-                        "店铺": "", # <-- 新增
-                        "商品链接": ""
-                    })
+                search(product_name)
                 
                 # 每个商品搜索后暂停一下，随机等待3-7秒
                 if index < len(data) - 1:
                     wait_time = random.uniform(3, 7)
                     print(f"\n处理完成，暂停 {wait_time:.1f} 秒后继续...")
-                    page.wait_for_timeout(int(wait_time * 1000))
+                    pool.wait(wait_time)
+
+                    # 利用间隙重试一条已到期的失败查询
+                    entry = retry_queue.pop_ready()
+                    if entry is not None:
+                        retry_entry(entry)
+
+            # 处理重试队列中剩余的查询
+            retry_queue.drain(retry_entry, sleep=pool.wait, until=deadline)
+            flush_pending()
+            print(f"\n重试成功 {retry_queue.recovered} 个商品，最终失败统计: {retry_queue.summary() or '无'}")
+            print(f"浏览器上下文回收 {pool.recycles} 次，崩溃重启 {pool.restarts} 次")
             
             print("\n所有商品处理完成。")
             
             # !! 修改：对结果进行去重 (包含平台和店铺) !!
             print(f"\n原始结果数量: {len(all_results)}")
-            unique_results = []
-            seen_combinations = set() # 用于存储已经见过的组合
-
-            for item in all_results:
-                if item["提取的商品名"] != "未找到匹配结果":
-                    # !! 修改：组合键包含平台和店铺 !!
-                    combination_key = (
-                        item["提取的商品名"], 
-                        item["价格"], 
-                        item["平台"], 
-                        item["店铺"], 
-                        item["商品链接"]
-                    )
-                    
-                    if combination_key not in seen_combinations:
-                        unique_results.append(item)
-                        seen_combinations.add(combination_key)
-                else:
-                    unique_results.append(item)
+            unique_results = dedupe(all_results)
             
             print(f"去重后结果数量: {len(unique_results)}")
             # !! 去重结束 !!
@@ -278,60 +369,46 @@ def main():
             # !! 修改：使用去重后的 unique_results 保存到 Excel (列名已更新) !!
             if unique_results: 
                 print("\n正在将去重后的结果保存到 Excel 文件...")
-                # !! 修改：更新列顺序 !!
-                columns_order = ["搜索词", "提取的商品名", "价格", "平台", "店铺", "商品链接"] 
-                results_df = pd.DataFrame(unique_results, columns=columns_order) 
                 output_filename = "manmanbuy_results.xlsx"
                 try:
-                    results_df.to_excel(output_filename, index=False)
+                    export_records(unique_results, output_filename, "manmanbuy")
                     print(f"结果已成功保存到: {output_filename}")
                 except Exception as save_error:
                     print(f"保存结果到 Excel 时出错: {save_error}")
             else:
                 print("没有提取到任何结果或所有结果都被去重，未生成 Excel 文件。")
 
-            print("脚本将在10秒后自动关闭，您可以手动关闭浏览器。")
-            page.wait_for_timeout(10000) 
+            pool.save_state()
+            if not headless:
+                print("脚本将在10秒后自动关闭，您可以手动关闭浏览器。")
+                pool.wait(10)
+
+            succeeded = True
 
         except Exception as e:
             print(f"\n在主流程中发生错误: {str(e)}")
+            flush_pending()
             # !! 修改：出错时也尝试保存去重后的部分结果 (包含平台和店铺) !!
             print("\n尝试对已收集的结果进行去重...")
-            unique_partial_results = []
-            seen_partial_combinations = set()
-            for item in all_results: 
-                 if item["提取的商品名"] != "未找到匹配结果":
-                     # !! 修改：组合键包含平台和店铺 !!
-                     combination_key = (
-                         item["提取的商品名"], 
-                         item["价格"], 
-                         item["平台"], 
-                         item["店铺"], 
-                         item["商品链接"]
-                     )
-                     if combination_key not in seen_partial_combinations:
-                         unique_partial_results.append(item)
-                         seen_partial_combinations.add(combination_key)
-                 else:
-                     unique_partial_results.append(item)
+            unique_partial_results = dedupe(all_results)
             
             if unique_partial_results:
                  print(f"去重后部分结果数量: {len(unique_partial_results)}")
                  print("尝试保存部分结果到 Excel 文件...")
-                 # !! 修改：更新列顺序 !!
-                 columns_order = ["搜索词", "提取的商品名", "价格", "平台", "店铺", "商品链接"]
-                 results_df = pd.DataFrame(unique_partial_results, columns=columns_order) 
                  output_filename = "manmanbuy_partial_results.xlsx"
                  try:
-                     results_df.to_excel(output_filename, index=False)
+                     export_records(unique_partial_results, output_filename, "manmanbuy")
                      print(f"部分结果已成功保存到: {output_filename}")
                  except Exception as save_error:
                      print(f"保存部分结果到 Excel 时出错: {save_error}")
 
         finally:
             print("正在关闭浏览器...")
-            browser.close()
+            pool.close()
             print("浏览器已关闭")
 
+    return succeeded
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
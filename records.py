@@ -0,0 +1,128 @@
+import re
+from dataclasses import dataclass
+
+# 结果在内存中统一保存为 SearchRecord，只有导出 Excel 时才转换为各脚本原有的中文列
+JD_RESULT_COLUMNS = ["品牌", "商品名称", "旗舰店铺", "价格值", "显示价格", "商品链接", "提取的商品标题"]
+MANMANBUY_RESULT_COLUMNS = ["搜索词", "提取的商品名", "价格", "平台", "店铺", "商品链接"]
+
+PRICE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(万)?")
+SKU_PATTERN = re.compile(r"item(?:\.m)?\.jd\.com/(?:product/)?(\d+)\.html")
+
+
+@dataclass(slots=True)
+class SearchRecord:
+    """一条搜索结果，京东和慢慢买共用"""
+
+    query: str                  # 搜索词（Excel中的商品名称）
+    brand: str = ""             # 品牌，慢慢买为空
+    title: str = ""             # 结果页中提取的商品标题
+    shop: str = ""              # 店铺名称
+    platform: str = ""          # 平台，京东为空
+    price: float | None = None  # 价格，未找到时为 None
+    sku_id: int | None = None   # 京东商品编号，从链接中解析
+    url: str = ""               # 商品链接
+    error: str = ""             # 失败原因，成功时为空
+
+    @property
+    def ok(self):
+        return not self.error
+
+    def dedupe_key(self):
+        return (self.title, self.price, self.platform, self.shop, self.url)
+
+
+def parse_price(text):
+    """
+    把页面上的价格文本转换为数值
+
+    取第一个数字作为价格，区间价如 "¥99-129" 取 99，"1.2万" 按万换算。
+
+    参数:
+        text (str): 价格文本，如 "¥1,299.00"
+
+    返回:
+        float: 价格，无法解析时返回 None
+    """
+    if not text:
+        return None
+    match = PRICE_PATTERN.search(str(text).replace(",", "").replace("，", ""))
+    if not match:
+        return None
+    price = float(match.group(1))
+    if match.group(2):
+        price *= 10000
+    return price
+
+
+def parse_sku_id(url):
+    """从京东商品链接中解析商品编号，解析不到时返回 None"""
+    if not url:
+        return None
+    match = SKU_PATTERN.search(url)
+    return int(match.group(1)) if match else None
+
+
+def to_jd_row(record):
+    """转换为 jd_search 原有的结果列"""
+    if record.error:
+        return {
+            "品牌": record.brand,
+            "商品名称": record.query,
+            "旗舰店铺": "搜索失败",
+            "价格值": "",
+            "显示价格": "",
+            "商品链接": f"错误: {record.error}",
+            "提取的商品标题": "",
+        }
+    return {
+        "品牌": record.brand,
+        "商品名称": record.query,
+        "旗舰店铺": record.shop,
+        "价格值": record.price if record.price is not None else "",
+        "显示价格": f"{record.price:.2f}" if record.price is not None else "",
+        "商品链接": record.url,
+        "提取的商品标题": record.title,
+    }
+
+
+def to_manmanbuy_row(record):
+    """转换为 manmanbuy_search 原有的结果列"""
+    if record.error:
+        return {
+            "搜索词": record.query,
+            "提取的商品名": "未找到匹配结果",
+            "价格": "",
+            "平台": "",
+            "店铺": "",
+            "商品链接": "",
+        }
+    return {
+        "搜索词": record.query,
+        "提取的商品名": record.title,
+        "价格": record.price if record.price is not None else "",
+        "平台": record.platform,
+        "店铺": record.shop,
+        "商品链接": record.url,
+    }
+
+
+EXPORT_LAYOUTS = {
+    "jd": (to_jd_row, JD_RESULT_COLUMNS),
+    "manmanbuy": (to_manmanbuy_row, MANMANBUY_RESULT_COLUMNS),
+}
+
+
+def export_records(records, file_path, layout):
+    """
+    按原有列布局把结果保存为Excel文件
+
+    参数:
+        records (list): SearchRecord 列表
+        file_path (str): 输出文件路径
+        layout (str): 列布局，"jd" 或 "manmanbuy"
+    """
+    import pandas as pd
+
+    to_row, columns = EXPORT_LAYOUTS[layout]
+    result_df = pd.DataFrame([to_row(record) for record in records], columns=columns)
+    result_df.to_excel(file_path, index=False)
@@ -0,0 +1,174 @@
+import random
+import time
+
+# 失败类型
+ERROR_TIMEOUT = "timeout"    # 页面加载/网络等待超时
+ERROR_SELECTOR = "selector"  # 等待的元素未出现（页面结构变化或未渲染）
+ERROR_RISK = "risk"          # 被重定向到风险验证页面
+ERROR_EMPTY = "empty"        # 搜索成功但没有符合条件的结果
+ERROR_OTHER = "error"        # 其他异常
+
+# 各失败类型的首次重试等待秒数，风险验证需要等更久再试
+BASE_DELAYS = {
+    ERROR_TIMEOUT: 30,
+    ERROR_SELECTOR: 60,
+    ERROR_RISK: 300,
+    ERROR_EMPTY: 60,
+    ERROR_OTHER: 60,
+}
+
+RISK_URL_MARKERS = ("cfe.m.jd.com/privatedomain/risk_handler",)
+
+
+def classify_error(error, current_url=""):
+    """
+    根据异常和当前页面URL判断失败类型
+
+    参数:
+        error (Exception): 搜索时抛出的异常
+        current_url (str): 发生异常时页面的URL
+
+    返回:
+        str: 失败类型 (timeout / selector / risk / error)
+    """
+    if current_url and any(marker in current_url for marker in RISK_URL_MARKERS):
+        return ERROR_RISK
+
+    message = str(error)
+    # Playwright 的 TimeoutError 与内置 TimeoutError 同名，按类名判断即可，无需导入 playwright
+    if type(error).__name__ == "TimeoutError":
+        if "waiting for selector" in message or "waiting for locator" in message:
+            return ERROR_SELECTOR
+        return ERROR_TIMEOUT
+    return ERROR_OTHER
+
+
+def describe_key(key):
+    """用于日志输出的查询描述，元组键按空格拼接"""
+    if isinstance(key, tuple):
+        return " ".join(str(part) for part in key)
+    return str(key)
+
+
+class RetryEntry:
+    """重试队列中的一条待重试查询"""
+
+    __slots__ = ("key", "kind", "message", "attempts", "next_at", "payload")
+
+    def __init__(self, key, kind, message, attempts, next_at, payload):
+        self.key = key
+        self.kind = kind
+        self.message = message
+        self.attempts = attempts
+        self.next_at = next_at
+        self.payload = payload
+
+
+class RetryQueue:
+    """
+    失败查询的重试队列
+
+    搜索失败或无结果的查询按失败类型入队，按指数退避安排下一次尝试，
+    每个查询的总尝试次数（含首次）不超过 max_attempts。
+    主循环可以在空闲时用 pop_ready() 取出已到期的查询，结束时用 drain() 处理剩余查询。
+    """
+
+    def __init__(self, max_attempts=3, max_delay=900, base_delays=None):
+        self.max_attempts = max_attempts
+        self.max_delay = max_delay
+        self.base_delays = dict(BASE_DELAYS)
+        if base_delays:
+            self.base_delays.update(base_delays)
+        self._pending = {}   # key -> RetryEntry
+        self._attempts = {}  # key -> 已尝试次数
+        self.exhausted = []  # 达到上限仍失败的查询
+        self.recovered = 0   # 重试后成功的查询数
+
+    def __len__(self):
+        return len(self._pending)
+
+    def is_pending(self, key):
+        return key in self._pending
+
+    def pending(self):
+        """返回仍在队列中等待重试的查询"""
+        return list(self._pending.values())
+
+    def pop_all(self):
+        """取出并清空所有仍在队列中的查询，用于在结束时把它们记录为失败"""
+        entries = list(self._pending.values())
+        self._pending.clear()
+        return entries
+
+    def push(self, key, kind, message="", payload=None):
+        """
+        记录一次失败的尝试并安排重试
+
+        参数:
+            key: 查询的唯一标识，如商品名称或 (品牌, 商品名称)
+            kind (str): 失败类型
+            message (str): 错误信息
+            payload: 重试时需要的额外数据
+
+        返回:
+            bool: 是否已加入重试队列；达到尝试上限时返回 False
+        """
+        attempts = self._attempts.get(key, 0) + 1
+        self._attempts[key] = attempts
+
+        entry = RetryEntry(key, kind, message, attempts, 0.0, payload)
+        if attempts >= self.max_attempts:
+            print(f"查询 '{describe_key(key)}' 已尝试 {attempts} 次仍失败 ({kind})，不再重试")
+            self.exhausted.append(entry)
+            return False
+
+        base = self.base_delays.get(kind, self.base_delays[ERROR_OTHER])
+        delay = min(base * (2 ** (attempts - 1)), self.max_delay)
+        delay *= random.uniform(0.8, 1.2)  # 加入抖动，避免重试集中在同一时刻
+        entry.next_at = time.monotonic() + delay
+        self._pending[key] = entry
+        print(f"查询 '{describe_key(key)}' 失败 ({kind})，已加入重试队列，{delay:.0f}秒后第 {attempts + 1} 次尝试")
+        return True
+
+    def mark_success(self, key):
+        """重试的查询成功后调用，用于统计"""
+        if self._attempts.get(key, 0) > 0 and key not in self._pending:
+            self.recovered += 1
+
+    def pop_ready(self):
+        """取出一条已到重试时间的查询，没有则返回 None"""
+        now = time.monotonic()
+        ready = [entry for entry in self._pending.values() if entry.next_at <= now]
+        if not ready:
+            return None
+        entry = min(ready, key=lambda e: e.next_at)
+        del self._pending[entry.key]
+        return entry
+
+    def drain(self, retry, sleep=time.sleep, until=None):
+        """
+        依次处理队列中剩余的所有查询，必要时等待到重试时间
+
+        参数:
+            retry (callable): 接收 RetryEntry 并重新执行查询，失败时应再次 push
+            sleep (callable): 等待函数，参数为秒数
+            until (float): 可选，time.monotonic() 的截止时间，到时剩余查询留在队列中
+        """
+        while self._pending:
+            entry = min(self._pending.values(), key=lambda e: e.next_at)
+            delay = entry.next_at - time.monotonic()
+            if until is not None and time.monotonic() + max(delay, 0) >= until:
+                print(f"\n已到时间预算，重试队列中剩余 {len(self._pending)} 条查询未处理")
+                return
+            if delay > 0:
+                print(f"\n重试队列剩余 {len(self._pending)} 条，等待 {delay:.0f} 秒后重试 '{describe_key(entry.key)}'...")
+                sleep(delay)
+            del self._pending[entry.key]
+            retry(entry)
+
+    def summary(self):
+        """按失败类型统计最终仍失败的查询"""
+        counts = {}
+        for entry in self.exhausted:
+            counts[entry.kind] = counts.get(entry.kind, 0) + 1
+        return counts
@@ -0,0 +1,209 @@
+import json
+import os
+import statistics
+import time
+
+# Excel中可选的业务优先级列，数值越大刷新越频繁，缺省为 1
+PRIORITY_COLUMN = "优先级"
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def history_key(key):
+    """历史记录中使用的键，(品牌, 商品名称) 这样的元组按 " / " 拼接"""
+    if isinstance(key, tuple):
+        return " / ".join(str(part) for part in key)
+    return str(key)
+
+
+class RefreshScheduler:
+    """
+    按价格波动、上次成功时间和业务优先级决定每个查询何时需要重新搜索
+
+    每个查询的刷新间隔 = 基础间隔 / (优先级 × (1 + 波动权重 × 价格变异系数))，
+    最近几次价格完全不变时再乘以 stable_multiplier，最后限制在 [min_interval, max_interval] 之间。
+    从未搜索过的查询总是到期；上次搜索失败或没有结果的查询按连续失败次数指数退避，
+    间隔为 min_interval × 2^(失败次数-1)，最多 max_interval，避免始终搜不到的商品每次都占用预算；
+    失败次数按运行计数，一次运行内的重试不会额外增加。
+    历史记录保存在 JSON 文件中，跨运行累积。
+    """
+
+    def __init__(self, history_path, base_interval=DAY, min_interval=HOUR, max_interval=14 * DAY,
+                 volatility_weight=10, stable_multiplier=4, max_prices=10):
+        self.history_path = history_path
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.volatility_weight = volatility_weight
+        self.stable_multiplier = stable_multiplier
+        self.max_prices = max_prices
+        self.history = self._load()
+        self._failed_this_run = set()  # 本次运行中已记过失败的查询，重试再失败不重复计数
+
+    def _load(self):
+        if not self.history_path or not os.path.exists(self.history_path):
+            return {}
+        try:
+            with open(self.history_path, encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取刷新历史 '{self.history_path}' 时发生错误: {str(e)}，将重新开始记录")
+            return {}
+
+    def save(self):
+        if not self.history_path:
+            return
+        tmp_path = self.history_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.history, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.history_path)
+        except Exception as e:
+            print(f"保存刷新历史时发生错误: {str(e)}")
+
+    def volatility(self, key):
+        """最近几次价格的变异系数 (标准差 / 均值)，数据不足时返回 None"""
+        prices = self.history.get(history_key(key), {}).get("prices", [])
+        if len(prices) < 2:
+            return None
+        mean = statistics.fmean(prices)
+        if mean <= 0:
+            return None
+        return statistics.pstdev(prices) / mean
+
+    def interval(self, key, priority=1):
+        """查询的刷新间隔 (秒)"""
+        priority = priority if priority and priority > 0 else 1
+        interval = self.base_interval / priority
+
+        volatility = self.volatility(key)
+        if volatility is not None:
+            interval /= 1 + self.volatility_weight * volatility
+            prices = self.history[history_key(key)]["prices"]
+            if volatility == 0 and len(prices) >= 3:
+                interval *= self.stable_multiplier
+
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def failure_backoff(self, key):
+        """连续失败后的重试间隔 (秒)，没有失败时返回 0"""
+        failures = self.history.get(history_key(key), {}).get("failures", 0)
+        if failures <= 0:
+            return 0
+        return min(self.min_interval * 2 ** (failures - 1), self.max_interval)
+
+    def urgency(self, key, priority=1, now=None):
+        """
+        查询的紧急程度，大于等于 1 表示已到期
+
+        返回:
+            float: 距上次成功的时间与刷新间隔之比 (优先级已体现在刷新间隔中)；
+                从未搜索过时返回无穷大，上次失败时按失败退避间隔计算
+        """
+        now = time.time() if now is None else now
+        entry = self.history.get(history_key(key))
+        if not entry or not entry.get("last_attempt"):
+            return float("inf")
+
+        backoff = self.failure_backoff(key)
+        if not entry.get("last_success"):
+            backoff = backoff or self.min_interval
+        if backoff:
+            # 上次搜索失败或没有结果，等退避间隔过去后再试
+            since_attempt = now - entry["last_attempt"]
+            if since_attempt < backoff or not entry.get("last_success"):
+                return since_attempt / backoff
+
+        return (now - entry["last_success"]) / self.interval(key, priority)
+
+    def select(self, entries, now=None, max_queries=None):
+        """
+        挑出已到期的查询，按紧急程度从高到低排序，紧急程度相同时优先级高的在前
+
+        参数:
+            entries (list): (查询, 优先级) 元组的列表，按Excel中的顺序
+            now (float): 当前时间戳，默认为 time.time()
+            max_queries (int): 最多返回多少个查询
+
+        返回:
+            list: 到期查询在 entries 中的位置
+        """
+        now = time.time() if now is None else now
+        scored = []
+        for position, (key, priority) in enumerate(entries):
+            score = self.urgency(key, priority, now)
+            if score >= 1:
+                scored.append((score, read_priority(priority), position))
+
+        scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        positions = [position for _, _, position in scored]
+        if max_queries is not None:
+            positions = positions[:max_queries]
+        return positions
+
+    def record(self, key, prices, now=None):
+        """
+        记录一次搜索结果
+
+        参数:
+            key: 查询，如商品名称或 (品牌, 商品名称)
+            prices (list): 本次搜索到的价格，为空表示失败或没有结果；
+                同一个查询在一次运行中（包括重试）多次失败只计一次
+        """
+        now = time.time() if now is None else now
+        name = history_key(key)
+        entry = self.history.setdefault(name, {"prices": []})
+        entry["last_attempt"] = now
+
+        prices = [price for price in prices if price is not None]
+        if prices:
+            entry["last_success"] = now
+            entry["failures"] = 0
+            self._failed_this_run.discard(name)
+            # 记录最低价，用于估计价格波动
+            entry["prices"] = (entry.get("prices", []) + [min(prices)])[-self.max_prices:]
+        elif name not in self._failed_this_run:
+            self._failed_this_run.add(name)
+            entry["failures"] = entry.get("failures", 0) + 1
+        self.save()
+
+
+def read_priority(value):
+    """把Excel中的优先级单元格转换为正数，无效值按 1 处理"""
+    try:
+        priority = float(value)
+    except (TypeError, ValueError):
+        return 1.0
+    if priority != priority or priority <= 0:  # NaN 或非正数
+        return 1.0
+    return priority
+
+
+def plan_queries(data, scheduler, key_columns, incremental=False, max_queries=None):
+    """
+    决定本次运行要搜索哪些行
+
+    参数:
+        data (pandas.DataFrame): 从Excel读取的数据
+        scheduler (RefreshScheduler): 刷新调度器
+        key_columns (str | tuple): 作为查询标识的列名，多列时以各列值组成的元组为标识
+        incremental (bool): 为 True 时只搜索到期的行，并按紧急程度排序
+        max_queries (int): 最多搜索多少行
+
+    返回:
+        pandas.DataFrame: 要搜索的行，索引已重置
+    """
+    if incremental:
+        priorities = data[PRIORITY_COLUMN] if PRIORITY_COLUMN in data.columns else [1] * len(data)
+        if isinstance(key_columns, str):
+            keys = data[key_columns]
+        else:
+            keys = zip(*(data[column] for column in key_columns))
+        entries = [(key, read_priority(priority)) for key, priority in zip(keys, priorities)]
+        positions = scheduler.select(entries, max_queries=max_queries)
+        print(f"增量模式: {len(data)} 个商品中有 {len(positions)} 个需要刷新")
+        data = data.iloc[positions]
+    elif max_queries is not None:
+        data = data.iloc[:max_queries]
+    return data.reset_index(drop=True)
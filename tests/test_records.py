@@ -0,0 +1,50 @@
+import unittest
+
+from records import SearchRecord, parse_price, parse_sku_id, to_jd_row, to_manmanbuy_row
+
+
+class ParsePriceTest(unittest.TestCase):
+    def test_plain_prices(self):
+        self.assertEqual(parse_price("¥1,299.00"), 1299)
+        self.assertEqual(parse_price("￥59.9"), 59.9)
+        self.assertEqual(parse_price(88), 88)
+
+    def test_range_takes_first_number(self):
+        self.assertEqual(parse_price("¥99-129"), 99)
+        self.assertEqual(parse_price("99.00 - 129.00"), 99)
+
+    def test_wan_unit(self):
+        self.assertEqual(parse_price("1.2万"), 12000)
+        self.assertEqual(parse_price("¥3 万起"), 30000)
+
+    def test_unparseable(self):
+        self.assertIsNone(parse_price(""))
+        self.assertIsNone(parse_price(None))
+        self.assertIsNone(parse_price("暂无报价"))
+
+
+class ParseSkuIdTest(unittest.TestCase):
+    def test_item_links(self):
+        self.assertEqual(parse_sku_id("https://item.jd.com/100012043978.html"), 100012043978)
+        self.assertEqual(parse_sku_id("//item.m.jd.com/product/100012043978.html"), 100012043978)
+
+    def test_other_links(self):
+        self.assertIsNone(parse_sku_id("https://search.jd.com/Search?keyword=x"))
+        self.assertIsNone(parse_sku_id(""))
+
+
+class ExportRowTest(unittest.TestCase):
+    def test_failed_record_rows(self):
+        record = SearchRecord(query="商品", brand="品牌", error="超时")
+        self.assertEqual(to_jd_row(record)["旗舰店铺"], "搜索失败")
+        self.assertEqual(to_jd_row(record)["商品链接"], "错误: 超时")
+        self.assertEqual(to_manmanbuy_row(record)["提取的商品名"], "未找到匹配结果")
+
+    def test_price_is_formatted_for_jd(self):
+        row = to_jd_row(SearchRecord(query="商品", price=99))
+        self.assertEqual(row["价格值"], 99)
+        self.assertEqual(row["显示价格"], "99.00")
+
+
+if __name__ == "__main__":
+    unittest.main()
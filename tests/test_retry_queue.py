@@ -0,0 +1,122 @@
+import time
+import unittest
+from unittest import mock
+
+from retry_queue import (ERROR_EMPTY, ERROR_OTHER, ERROR_RISK, ERROR_SELECTOR, ERROR_TIMEOUT,
+                         RetryQueue, classify_error)
+
+
+class TimeoutError(Exception):
+    """与 Playwright 的 TimeoutError 同名，classify_error 按类名判断"""
+
+
+class RetryQueueTest(unittest.TestCase):
+    def setUp(self):
+        # 去掉抖动，便于检查退避时间
+        patcher = mock.patch("retry_queue.random.uniform", return_value=1.0)
+        self.uniform = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = RetryQueue(max_attempts=3, max_delay=900)
+
+    def delay_of(self, key):
+        entry = next(entry for entry in self.queue.pending() if entry.key == key)
+        return entry.next_at - time.monotonic()
+
+    def test_backoff_doubles_per_attempt(self):
+        self.queue.push("a", ERROR_TIMEOUT)
+        self.assertAlmostEqual(self.delay_of("a"), 30, delta=1)
+        self.queue.pop_all()
+        self.queue.push("a", ERROR_TIMEOUT)
+        self.assertAlmostEqual(self.delay_of("a"), 60, delta=1)
+
+    def test_backoff_is_clamped_to_max_delay(self):
+        queue = RetryQueue(max_attempts=5, max_delay=400)
+        queue.push("a", ERROR_RISK)
+        queue.pop_all()
+        queue.push("a", ERROR_RISK)
+        entry = queue.pending()[0]
+        self.assertAlmostEqual(entry.next_at - time.monotonic(), 400, delta=1)
+
+    def test_jitter_is_within_twenty_percent(self):
+        self.uniform.return_value = 1.2
+        self.queue.push("a", ERROR_TIMEOUT)
+        self.uniform.assert_called_with(0.8, 1.2)
+        self.assertAlmostEqual(self.delay_of("a"), 36, delta=1)
+
+    def test_query_is_exhausted_on_third_attempt(self):
+        self.assertTrue(self.queue.push("a", ERROR_EMPTY))
+        self.queue.pop_all()
+        self.assertTrue(self.queue.push("a", ERROR_EMPTY))
+        self.queue.pop_all()
+        self.assertFalse(self.queue.push("a", ERROR_EMPTY))
+
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual([entry.key for entry in self.queue.exhausted], ["a"])
+        self.assertEqual(self.queue.summary(), {ERROR_EMPTY: 1})
+
+    def test_mark_success_counts_recovered_queries(self):
+        self.queue.push("a", ERROR_TIMEOUT)
+        self.queue.mark_success("a")  # 仍在队列中，不算恢复
+        self.queue.pop_all()
+        self.queue.mark_success("a")
+        self.queue.mark_success("b")  # 从未失败过
+        self.assertEqual(self.queue.recovered, 1)
+
+    def test_pop_ready_returns_only_due_entries(self):
+        self.queue.push("a", ERROR_TIMEOUT)
+        self.queue.push("b", ERROR_TIMEOUT)
+        self.assertIsNone(self.queue.pop_ready())
+
+        entries = {entry.key: entry for entry in self.queue.pending()}
+        entries["b"].next_at = time.monotonic() - 2
+        entries["a"].next_at = time.monotonic() - 1
+        self.assertEqual(self.queue.pop_ready().key, "b")
+        self.assertEqual(self.queue.pop_ready().key, "a")
+        self.assertIsNone(self.queue.pop_ready())
+
+    def test_drain_retries_in_order_and_waits(self):
+        self.queue.push("a", ERROR_TIMEOUT)
+        self.queue.push("b", ERROR_SELECTOR)
+        retried, waits = [], []
+
+        self.queue.drain(lambda entry: retried.append(entry.key), sleep=waits.append)
+
+        self.assertEqual(retried, ["a", "b"])
+        self.assertEqual(len(waits), 2)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_drain_stops_at_until(self):
+        self.queue.push("a", ERROR_TIMEOUT)
+        self.queue.push("b", ERROR_SELECTOR)
+        retried, waits = [], []
+
+        # a 在 30 秒后到期，可以在截止前重试；b 在 60 秒后到期，超过截止时间
+        self.queue.drain(lambda entry: retried.append(entry.key), sleep=waits.append,
+                         until=time.monotonic() + 45)
+
+        self.assertEqual(retried, ["a"])
+        self.assertEqual(len(waits), 1)
+        self.assertEqual([entry.key for entry in self.queue.pending()], ["b"])
+
+
+class ClassifyErrorTest(unittest.TestCase):
+    def test_risk_url_wins(self):
+        url = "https://cfe.m.jd.com/privatedomain/risk_handler/03101900/?returnurl=x"
+        self.assertEqual(classify_error(TimeoutError("Timeout 60000ms exceeded."), url), ERROR_RISK)
+        self.assertEqual(classify_error(RuntimeError("检测到风险验证页面"), url), ERROR_RISK)
+
+    def test_timeout_waiting_for_selector(self):
+        error = TimeoutError('Timeout 60000ms exceeded.\nwaiting for selector "#J_goodsList ul.gl-warp > li"')
+        self.assertEqual(classify_error(error, "https://search.jd.com/Search"), ERROR_SELECTOR)
+        error = TimeoutError('Timeout 30000ms exceeded.\nwaiting for locator("#key")')
+        self.assertEqual(classify_error(error), ERROR_SELECTOR)
+
+    def test_other_timeouts(self):
+        self.assertEqual(classify_error(TimeoutError("Timeout 60000ms exceeded.")), ERROR_TIMEOUT)
+
+    def test_other_errors(self):
+        self.assertEqual(classify_error(ValueError("boom"), "https://search.jd.com/Search"), ERROR_OTHER)
+
+
+if __name__ == "__main__":
+    unittest.main()
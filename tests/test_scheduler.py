@@ -0,0 +1,96 @@
+import unittest
+
+from scheduler import DAY, HOUR, RefreshScheduler
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        # history_path 为 None 时只在内存中记录，不写文件
+        self.scheduler = RefreshScheduler(None)
+        self.now = 1_000_000_000.0
+
+    def test_interval_divides_base_by_priority_once(self):
+        self.assertEqual(self.scheduler.interval("a"), DAY)
+        self.assertEqual(self.scheduler.interval("a", priority=2), DAY / 2)
+
+    def test_interval_is_clamped(self):
+        self.assertEqual(self.scheduler.interval("a", priority=100), HOUR)
+        self.scheduler.history["b"] = {"prices": [100, 100, 100], "last_success": self.now}
+        self.assertEqual(self.scheduler.interval("b", priority=0.1), 14 * DAY)
+
+    def test_volatile_prices_shorten_interval(self):
+        self.scheduler.history["stable"] = {"prices": [100, 100, 100], "last_success": self.now}
+        self.scheduler.history["volatile"] = {"prices": [80, 100, 120], "last_success": self.now}
+        self.assertGreater(self.scheduler.interval("stable"), DAY)
+        self.assertLess(self.scheduler.interval("volatile"), DAY)
+
+    def test_priority_row_due_after_base_over_priority(self):
+        self.scheduler.record("a", [100], now=self.now)
+        self.assertLess(self.scheduler.urgency("a", 2, now=self.now + 11 * HOUR), 1)
+        self.assertGreaterEqual(self.scheduler.urgency("a", 2, now=self.now + 12 * HOUR), 1)
+
+    def test_high_priority_row_respects_min_interval(self):
+        self.scheduler.record("a", [100], now=self.now)
+        self.assertLess(self.scheduler.urgency("a", 10, now=self.now + 15 * 60), 1)
+
+    def test_select_orders_by_urgency_then_priority(self):
+        for key in ("old", "recent", "tie_low", "tie_high"):
+            self.scheduler.record(key, [100], now=self.now)
+        self.scheduler.record("old", [100], now=self.now - 2 * DAY)
+        entries = [("recent", 1), ("tie_low", 1), ("old", 1), ("tie_high", 2), ("new", 1)]
+
+        positions = self.scheduler.select(entries, now=self.now + DAY)
+
+        # new 从未搜索过排最前，old 超期最多，tie_high 优先级高、间隔短，
+        # recent 和 tie_low 紧急程度相同时按Excel中的顺序
+        self.assertEqual(positions, [4, 2, 3, 0, 1])
+
+    def next_run(self):
+        # 每次运行新建调度器，历史记录沿用上一次的
+        history = self.scheduler.history
+        self.scheduler = RefreshScheduler(None)
+        self.scheduler.history = history
+
+    def test_rows_without_results_back_off_exponentially(self):
+        self.scheduler.record("empty", [], now=self.now)
+        self.assertLess(self.scheduler.urgency("empty", now=self.now + 59 * 60), 1)
+        self.assertGreaterEqual(self.scheduler.urgency("empty", now=self.now + HOUR), 1)
+
+        self.next_run()
+        self.scheduler.record("empty", [], now=self.now + HOUR)
+        self.next_run()
+        self.scheduler.record("empty", [], now=self.now + 2 * HOUR)
+        self.assertLess(self.scheduler.urgency("empty", now=self.now + 5 * HOUR), 1)
+        self.assertGreaterEqual(self.scheduler.urgency("empty", now=self.now + 6 * HOUR), 1)
+
+    def test_never_searched_row_sorts_before_empty_row(self):
+        self.scheduler.record("empty", [], now=self.now - DAY)
+        entries = [("empty", 1), ("new", 1)]
+        self.assertEqual(self.scheduler.select(entries, now=self.now), [1, 0])
+
+    def test_retries_within_a_run_count_as_one_failure(self):
+        for minutes in (0, 1, 2):
+            self.scheduler.record("a", [], now=self.now + minutes * 60)
+        self.assertEqual(self.scheduler.history["a"]["failures"], 1)
+        self.assertEqual(self.scheduler.failure_backoff("a"), HOUR)
+
+    def test_success_resets_failure_backoff(self):
+        self.scheduler.record("a", [], now=self.now)
+        self.next_run()
+        self.scheduler.record("a", [], now=self.now + HOUR)
+        self.scheduler.record("a", [100], now=self.now + 3 * HOUR)
+        self.assertEqual(self.scheduler.failure_backoff("a"), 0)
+
+    def test_select_respects_max_queries(self):
+        entries = [("a", 1), ("b", 1), ("c", 1)]
+        self.assertEqual(self.scheduler.select(entries, now=self.now, max_queries=2), [0, 1])
+
+    def test_tuple_keys_are_recorded_per_brand(self):
+        self.scheduler.record(("品牌A", "商品"), [100], now=self.now)
+        entries = [(("品牌A", "商品"), 1), (("品牌B", "商品"), 1)]
+        self.assertEqual(self.scheduler.select(entries, now=self.now + HOUR), [1])
+        self.assertIn("品牌A / 商品", self.scheduler.history)
+
+
+if __name__ == "__main__":
+    unittest.main()